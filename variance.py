@@ -1,6 +1,12 @@
+import json
+from pathlib import Path
+
 import streamlit as st
 import pandas as pd
-import plotly.express as px
+import numpy as np
+import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 # ================================
 # Page Config
@@ -11,47 +17,166 @@ st.title("📊 Sales & Profit Insights (Jul–Sep)")
 # ================================
 # Load Data
 # ================================
+sales_cols = [
+    "Jul-2025 Total Sales", "Jul-2025 Total Profit",
+    "Aug-2025 Total Sales", "Aug-2025 Total Profit",
+    "Sep-2025 Total Sales", "Sep-2025 Total Profit"
+]
+month_sales_cols = [c for c in sales_cols if c.endswith("Total Sales")]
+month_profit_cols = [c for c in sales_cols if c.endswith("Total Profit")]
+months = [c.removesuffix(" Total Sales") for c in month_sales_cols]
+price_num_cols = ["Cost", "Selling", "Stock"]
+
+# Only the columns used downstream are parsed from the workbooks
+sales_usecols = {"Item Code", "Item Name", "Category", *sales_cols}
+price_usecols = {"Item Bar Code", "Item Name", "Category", *price_num_cols}
+
+sales_dtypes = {"Item Code": "string", **{c: "float32" for c in sales_cols}}
+price_dtypes = {"Item Bar Code": "string", **{c: "float32" for c in price_num_cols}}
+
+# Part of every cache file name: bump it whenever the loaders or build_merged
+# change the columns or dtypes they write, so caches from older code are ignored
+CACHE_VERSION = 1
+
+def _cached_parquet(xlsx_path):
+    """Sibling .parquet file used to cache the parsed Excel workbook."""
+    return Path(xlsx_path).with_suffix(f".v{CACHE_VERSION}.parquet")
+
+def _source_key(*sources):
+    """Workbook paths and the exact mtimes a cached frame is built from."""
+    return json.dumps([[str(Path(path).resolve()), mtime] for path, mtime in sources]).encode()
+
+def _read_cache(parquet, source_key):
+    """Cached frame, or None unless it was written for exactly these sources."""
+    parquet = Path(parquet)
+    if not parquet.exists():
+        return None
+    # Only the footer is read here; an older or replaced workbook never matches
+    if (pq.read_schema(parquet).metadata or {}).get(b"sources") != source_key:
+        return None
+    return pd.read_parquet(parquet)
+
+def _write_cache(df, parquet, source_key):
+    table = pa.Table.from_pandas(df)
+    table = table.replace_schema_metadata({**table.schema.metadata, b"sources": source_key})
+    pq.write_table(table, parquet, compression="zstd")
+
 @st.cache_data
-def load_sales_data(file_path):
-    df = pd.read_excel(file_path)
-    df["Item Code"] = df["Item Code"].astype(str)
-    return df.fillna(0)
+def load_sales_data(file_path, file_mtime):
+    # file_mtime is a cache key here and for the parquet file, so an edited
+    # or replaced workbook is re-read
+    parquet = _cached_parquet(file_path)
+    source_key = _source_key((file_path, file_mtime))
+    cached = _read_cache(parquet, source_key)
+    if cached is not None:
+        return cached
+    df = pd.read_excel(file_path, engine="calamine",
+                       usecols=lambda c: c in sales_usecols, dtype=sales_dtypes)
+    df = df.fillna(dict.fromkeys(sales_cols, 0))
+    _write_cache(df, parquet, source_key)
+    return df
 
 @st.cache_data
-def load_price_list(file_path):
-    df = pd.read_excel(file_path)
-    df["Item Bar Code"] = df["Item Bar Code"].astype(str)
-    return df.fillna(0)
+def load_price_list(file_path, file_mtime):
+    # file_mtime is a cache key here and for the parquet file, so an edited
+    # or replaced workbook is re-read
+    parquet = _cached_parquet(file_path)
+    source_key = _source_key((file_path, file_mtime))
+    cached = _read_cache(parquet, source_key)
+    if cached is not None:
+        return cached
+    df = pd.read_excel(file_path, engine="calamine",
+                       usecols=lambda c: c in price_usecols, dtype=price_dtypes)
+    df = df.fillna(dict.fromkeys(price_num_cols, 0))
+    _write_cache(df, parquet, source_key)
+    return df
 
 # ================================
 # File paths
 # ================================
 sales_file = "july to sep safa2025.Xlsx"
 price_file = "price list.xlsx"
+merged_cache_file = f"merged_cache.v{CACHE_VERSION}.parquet"
 
-sales_df = load_sales_data(sales_file)
-price_df = load_price_list(price_file)
+# ================================
+# Compute Totals
+# ================================
+def compute_totals(df):
+    df["Total Sales"] = df[month_sales_cols].sum(axis=1)
+    df["Total Profit"] = df[month_profit_cols].sum(axis=1)
+    sales = df["Total Sales"].to_numpy(dtype="float32")
+    profit = df["Total Profit"].to_numpy(dtype="float32")
+    gp = np.zeros_like(sales)
+    np.divide(profit, sales, out=gp, where=sales != 0)
+    df["Overall GP"] = gp
+    return df
 
 # ================================
 # Clean & Prepare Data
 # ================================
-sales_cols = [
-    "Jul-2025 Total Sales", "Jul-2025 Total Profit",
-    "Aug-2025 Total Sales", "Aug-2025 Total Profit",
-    "Sep-2025 Total Sales", "Sep-2025 Total Profit"
-]
-for col in sales_cols:
-    if col not in sales_df.columns:
-        sales_df[col] = 0
+@st.cache_data
+def build_merged(sales_mtime, price_mtime):
+    # The mtimes key both caches: a changed or replaced workbook rebuilds the base frame
+    source_key = _source_key((sales_file, sales_mtime), (price_file, price_mtime))
+    cached = _read_cache(merged_cache_file, source_key)
+    if cached is not None:
+        return cached
+
+    sales_df = load_sales_data(sales_file, sales_mtime)
+    price_df = load_price_list(price_file, price_mtime)
+
+    # Missing numeric columns are added in one reindex per frame
+    sales_df = sales_df.reindex(columns=sales_df.columns.union(sales_cols, sort=False), fill_value=0)
+    price_df = price_df.reindex(columns=price_df.columns.union(price_num_cols, sort=False), fill_value=0)
+
+    # Merge both datasets initially (base data)
+    merged_df = price_df.join(sales_df.set_index("Item Code"), on="Item Bar Code", how="left", rsuffix="_sales")
+    # Item Name / Category may come from either workbook: the price list wins, sales fills its gaps
+    for col in price_df.columns.intersection(sales_df.columns):
+        merged_df[col] = merged_df[col].combine_first(merged_df.pop(f"{col}_sales"))
+    # Fill numeric and text columns separately so text columns never receive 0
+    num_cols = sales_cols + price_num_cols
+    merged_df[num_cols] = merged_df[num_cols].astype("float32").fillna(0.0)
+    # Item Name is optional in both workbooks; searches and the table still need it
+    merged_df = merged_df.reindex(columns=merged_df.columns.union(["Item Name"], sort=False), fill_value="")
+    merged_df = merged_df.fillna({"Item Name": ""})
+
+    if "Category" not in merged_df.columns:
+        merged_df["Category"] = "Unknown"
+    else:
+        merged_df["Category"] = merged_df["Category"].fillna("Unknown").astype(str).replace("", "Unknown")
+    # Low-cardinality column: filters and groupbys work on the integer codes
+    merged_df["Category"] = merged_df["Category"].astype("category")
+
+    # Lower-cased search columns (hidden from the table) for the sidebar searches
+    merged_df["_item_name_lc"] = merged_df["Item Name"].astype("string").str.lower()
+    merged_df["_barcode_lc"] = merged_df["Item Bar Code"].astype("string").str.lower()
+
+    # Totals only depend on the month columns, so compute them once here
+    merged_df = compute_totals(merged_df)
+    _write_cache(merged_df, merged_cache_file, source_key)
+    return merged_df
+
+@st.cache_data
+def build_category_summary(sales_mtime, price_mtime):
+    # Sum in float64: float32 category totals lose whole units above 2**24
+    summary = build_merged(sales_mtime, price_mtime)[["Category", "Total Sales", "Total Profit"]].astype(
+        {"Total Sales": "float64", "Total Profit": "float64"}
+    ).groupby("Category", observed=True).agg({
+        "Total Sales": "sum",
+        "Total Profit": "sum"
+    }).reset_index()
+    summary["GP%"] = summary["Total Profit"] / summary["Total Sales"].replace(0, 1)
+    return summary
+
+@st.cache_data
+def build_category_list(sales_mtime, price_mtime):
+    return ["All"] + sorted(build_merged(sales_mtime, price_mtime)["Category"].cat.categories.tolist())
 
-# Merge both datasets initially (base data)
-merged_df = pd.merge(price_df, sales_df, left_on="Item Bar Code", right_on="Item Code", how="left")
-merged_df.fillna(0, inplace=True)
+sales_mtime = Path(sales_file).stat().st_mtime
+price_mtime = Path(price_file).stat().st_mtime
 
-if "Category" not in merged_df.columns:
-    merged_df["Category"] = "Unknown"
-else:
-    merged_df["Category"] = merged_df["Category"].astype(str).replace("", "Unknown")
+merged_df = build_merged(sales_mtime, price_mtime)
 
 # ================================
 # Sidebar Filters
@@ -63,42 +188,35 @@ item_search = st.sidebar.text_input("Search Item Name")
 barcode_search = st.sidebar.text_input("Search Item Bar Code")
 
 # Category filter
-all_categories = ["All"] + sorted(merged_df["Category"].dropna().unique().tolist())
+all_categories = build_category_list(sales_mtime, price_mtime)
 selected_category = st.sidebar.selectbox("Select Category", all_categories)
 
 # ================================
 # Apply Filters
 # ================================
-filtered_df = merged_df.copy()
-
-# Category filter first
+# All filters combine into one mask; nothing is copied while none are active
+mask = np.ones(len(merged_df), dtype=bool)
 if selected_category != "All":
-    filtered_df = filtered_df[filtered_df["Category"] == selected_category]
-
-# Search filters next
+    categories = merged_df["Category"].cat.categories
+    mask &= merged_df["Category"].cat.codes.to_numpy() == categories.get_loc(selected_category)
 if item_search:
-    filtered_df = filtered_df[filtered_df["Item Name"].astype(str).str.contains(item_search, case=False, na=False)]
+    mask &= merged_df["_item_name_lc"].str.contains(item_search.lower(), regex=False, na=False).to_numpy(dtype=bool)
 if barcode_search:
-    filtered_df = filtered_df[filtered_df["Item Bar Code"].astype(str).str.contains(barcode_search, case=False, na=False)]
-
-# ================================
-# Compute Totals
-# ================================
-def compute_totals(df):
-    df["Total Sales"] = df["Jul-2025 Total Sales"] + df["Aug-2025 Total Sales"] + df["Sep-2025 Total Sales"]
-    df["Total Profit"] = df["Jul-2025 Total Profit"] + df["Aug-2025 Total Profit"] + df["Sep-2025 Total Profit"]
-    df["Overall GP"] = df.apply(lambda x: (x["Total Profit"] / x["Total Sales"]) if x["Total Sales"] != 0 else 0, axis=1)
-    return df
+    mask &= merged_df["_barcode_lc"].str.contains(barcode_search.lower(), regex=False, na=False).to_numpy(dtype=bool)
 
-filtered_df = compute_totals(filtered_df)
+filtered_df = merged_df if mask.all() else merged_df.loc[mask]
 
 # ================================
 # Key Metrics
 # ================================
 st.markdown(f"### 🔑 Key Metrics {'(All Categories)' if selected_category == 'All' else f'({selected_category})'}")
 
-total_sales = filtered_df["Total Sales"].sum()
-total_profit = filtered_df["Total Profit"].sum()
+# One reduction feeds both the key metrics and the monthly chart. Columns are
+# stored as float32 but summed in float64, so totals above 2**24 stay exact
+totals_cols = sales_cols + ["Total Sales", "Total Profit"]
+column_totals = pd.Series(filtered_df[totals_cols].to_numpy(dtype="float64").sum(axis=0), index=totals_cols)
+total_sales = column_totals["Total Sales"]
+total_profit = column_totals["Total Profit"]
 overall_gp = (total_profit / total_sales) if total_sales != 0 else 0
 
 col1, col2, col3 = st.columns(3)
@@ -111,43 +229,42 @@ col3.metric("Overall GP", f"{overall_gp:.2%}")
 # ================================
 st.markdown("### 📅 Month-wise Performance")
 
-months = ["Jul-2025", "Aug-2025", "Sep-2025"]
-month_data = []
-for month in months:
-    sales_col = f"{month} Total Sales"
-    profit_col = f"{month} Total Profit"
-    month_data.append({"Month": month, "Type": "Sales", "Value": filtered_df[sales_col].sum()})
-    month_data.append({"Month": month, "Type": "Profit", "Value": filtered_df[profit_col].sum()})
-
-monthly_df = pd.DataFrame(month_data)
-fig_monthly = px.bar(
-    monthly_df, x="Month", y="Value", color="Type", barmode="group",
-    text="Value", title=f"Monthly Sales & Profit ({selected_category})"
-)
+fig_monthly = go.Figure([
+    go.Bar(name="Sales", x=months, y=column_totals[month_sales_cols].to_numpy(),
+           texttemplate="%{y:,.0f}"),
+    go.Bar(name="Profit", x=months, y=column_totals[month_profit_cols].to_numpy(),
+           texttemplate="%{y:,.0f}")
+])
+fig_monthly.update_layout(barmode="group", title=f"Monthly Sales & Profit ({selected_category})",
+                          xaxis_title="Month", yaxis_title="Value", legend_title="Type")
 st.plotly_chart(fig_monthly, use_container_width=True)
 
 # ================================
 # Category-wise Summary
 # ================================
-category_summary = merged_df.groupby("Category").agg({
-    "Total Sales": "sum",
-    "Total Profit": "sum"
-}).reset_index()
-category_summary["GP%"] = category_summary["Total Profit"] / category_summary["Total Sales"].replace(0, 1)
+category_summary = build_category_summary(sales_mtime, price_mtime)
+category_names = category_summary["Category"].to_numpy()
+
+def category_bar(values, title, texttemplate):
+    fig = go.Figure(go.Bar(
+        x=category_names, y=values, texttemplate=texttemplate, textposition="auto",
+        marker=dict(color=values, colorscale="Plasma", showscale=True)
+    ))
+    fig.update_layout(title=title, xaxis_title="Category")
+    return fig
 
 st.markdown("### 🏷 Category-wise Overview")
 
-fig_sales = px.bar(category_summary, x="Category", y="Total Sales", color="Total Sales",
-                   text="Total Sales", title="Total Sales by Category")
+fig_sales = category_bar(category_summary["Total Sales"].to_numpy(),
+                         "Total Sales by Category", "%{y:,.0f}")
 st.plotly_chart(fig_sales, use_container_width=True)
 
-fig_profit = px.bar(category_summary, x="Category", y="Total Profit", color="Total Profit",
-                    text="Total Profit", title="Total Profit by Category")
+fig_profit = category_bar(category_summary["Total Profit"].to_numpy(),
+                          "Total Profit by Category", "%{y:,.0f}")
 st.plotly_chart(fig_profit, use_container_width=True)
 
-fig_gp = px.bar(category_summary, x="Category", y="GP% ", color="GP% ",
-                text=category_summary["GP%"].apply(lambda x: f"{x:.2%}"),
-                title="Gross Profit % by Category")
+fig_gp = category_bar(category_summary["GP%"].to_numpy(dtype="float32"),
+                      "Gross Profit % by Category", "%{y:.2%}")
 st.plotly_chart(fig_gp, use_container_width=True)
 
 # ================================
@@ -163,11 +280,27 @@ table_cols = [
     "Sep-2025 Total Sales", "Sep-2025 Total Profit"
 ]
 
-for col in table_cols:
-    if col not in filtered_df.columns:
-        filtered_df[col] = 0
-
-filtered_df["Overall GP"] = filtered_df["Overall GP"].apply(lambda x: f"{x:.2%}")
-
-st.dataframe(filtered_df[table_cols].sort_values("Total Sales", ascending=False),
-             use_container_width=True, hide_index=True)
+# Display-only formatting: the columns stay numeric, so sorting is unaffected
+table_column_config = {
+    **{c: st.column_config.NumberColumn(format="%,.2f") for c in price_num_cols + sales_cols},
+    "Total Sales": st.column_config.NumberColumn(format="%,.0f"),
+    "Total Profit": st.column_config.NumberColumn(format="%,.0f"),
+    "Overall GP": st.column_config.NumberColumn(format="percent"),
+}
+
+# Only the current page is sent to the browser. The stable sort keeps ties
+# (e.g. the many items with no sales) in row order, so pages never overlap
+page_size = 200
+row_count = len(filtered_df)
+page_count = max(1, -(-row_count // page_size))
+page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+
+page_end = min(page * page_size, row_count)
+order = np.argsort(-filtered_df["Total Sales"].to_numpy(), kind="stable")
+page_rows = order[(page - 1) * page_size:page_end]
+
+st.caption(f"Showing items {min((page - 1) * page_size + 1, row_count):,}–{page_end:,} of {row_count:,}")
+st.dataframe(
+    filtered_df.iloc[page_rows][table_cols],
+    column_config=table_column_config, use_container_width=True, hide_index=True
+)